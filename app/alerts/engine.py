@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import logging
+
+from app.alerts.rules import CompiledRule, RuleState
+from app.metrics import (
+    alert_rule_errors_total,
+    alerts_active,
+    alerts_fired_total,
+    alerts_resolved_total,
+)
+from app.schemas.alert import AlertEvent
+from app.schemas.robot_status import RobotStatusIn
+from app.sse.manager import SSEManager
+
+logger = logging.getLogger(__name__)
+
+ALL_SERIALS = "*"
+
+
+class AlertEngine:
+    """Evaluates compiled rules incrementally against per-serial state.
+
+    Only state transitions (firing / resolved) produce events; steady-state
+    messages cost one ``evaluate`` call per rule and no allocations beyond
+    the first message seen for a serial.
+    """
+
+    def __init__(
+        self, rules: list[CompiledRule], sse_manager: SSEManager | None = None
+    ) -> None:
+        self._rules = rules
+        self._sse_manager = sse_manager
+        self._states: dict[str, list[RuleState]] = {}
+        self._fired = [alerts_fired_total.labels(rule.name) for rule in rules]
+        self._resolved = [alerts_resolved_total.labels(rule.name) for rule in rules]
+        self._active = [alerts_active.labels(rule.name) for rule in rules]
+        self._errors = [alert_rule_errors_total.labels(rule.name) for rule in rules]
+
+    @property
+    def rules(self) -> list[CompiledRule]:
+        return self._rules
+
+    def process(self, serial_number: str, status: RobotStatusIn) -> list[AlertEvent]:
+        states = self._states.get(serial_number)
+        if states is None:
+            states = [RuleState() for _ in self._rules]
+            self._states[serial_number] = states
+
+        ts = status.ts.timestamp()
+        events: list[AlertEvent] = []
+        for index, rule in enumerate(self._rules):
+            state = states[index]
+            try:
+                firing = rule.evaluate(state, status, ts)
+            except Exception:
+                # A broken rule must never stop the message from being stored.
+                self._errors[index].inc()
+                logger.exception(
+                    "Alert rule %s failed for serial=%s", rule.name, serial_number
+                )
+                continue
+            if firing is None or firing == state.active:
+                continue
+            state.active = firing
+            if firing:
+                self._fired[index].inc()
+                self._active[index].inc()
+            else:
+                self._resolved[index].inc()
+                self._active[index].dec()
+            events.append(
+                AlertEvent(
+                    rule=rule.name,
+                    severity=rule.severity,
+                    state="firing" if firing else "resolved",
+                    serial_number=serial_number,
+                    ts=status.ts,
+                    value=state.value,
+                )
+            )
+
+        if events:
+            self._publish(serial_number, events)
+        return events
+
+    def _publish(self, serial_number: str, events: list[AlertEvent]) -> None:
+        for event in events:
+            logger.info(
+                "Alert %s rule=%s serial=%s value=%s",
+                event.state,
+                event.rule,
+                serial_number,
+                event.value,
+            )
+            if self._sse_manager is None:
+                continue
+            data = event.model_dump_json(by_alias=True)
+            self._sse_manager.broadcast(serial_number, data)
+            self._sse_manager.broadcast(ALL_SERIALS, data)
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import json
+import math
+import operator
+from abc import ABC, abstractmethod
+from operator import attrgetter
+from pathlib import Path
+from typing import Any, Callable
+from uuid import UUID
+
+from app.schemas.alert import AlertCondition, AlertRuleSpec
+from app.schemas.robot_status import BatteryStatus, DrivingStatus, RobotStatusIn
+
+EARTH_RADIUS_M = 6_371_000.0
+
+_OPS: dict[str, Callable[[Any, Any], bool]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+_ORDERING_OPS = {">", ">=", "<", "<="}
+
+_NUMERIC_FIELDS = {
+    "battery_level",
+    "location.latitude",
+    "location.longitude",
+    "location.height",
+}
+
+# Field -> constructor used to coerce rule values to the field's type.
+_FIELD_TYPES: dict[str, Callable[[Any], Any]] = {
+    "battery_level": float,
+    "battery_status": BatteryStatus,
+    "driving_status": DrivingStatus,
+    "current_drive_id": UUID,
+    "location.latitude": float,
+    "location.longitude": float,
+    "location.height": float,
+}
+
+DEFAULT_RULES: list[dict[str, Any]] = [
+    {
+        "name": "low_battery_while_moving",
+        "kind": "threshold",
+        "field": "battery_level",
+        "op": "<",
+        "value": 20,
+        "when": [{"field": "driving_status", "op": "==", "value": "MOVING"}],
+    },
+    {
+        "name": "drive_too_long",
+        "kind": "duration",
+        "field": "driving_status",
+        "op": "==",
+        "value": "MOVING",
+        "for_sec": 1800,
+    },
+    {
+        "name": "location_jump",
+        "kind": "rate",
+        "field": "location",
+        "op": ">",
+        "value": 5.0,
+        "severity": "critical",
+    },
+]
+
+
+class RuleState:
+    __slots__ = ("active", "since", "prev_sample", "prev_ts", "value")
+
+    def __init__(self) -> None:
+        self.active = False
+        self.since: float | None = None
+        self.prev_sample: Any = None
+        self.prev_ts = 0.0
+        self.value: Any = None
+
+
+class CompiledRule(ABC):
+    """A rule spec resolved into getters and operators, evaluated per message.
+
+    ``evaluate`` returns whether the rule is firing for this message, or None
+    when the message carries no information for the rule (e.g. the first
+    sample of a rate rule).
+    """
+
+    __slots__ = ("name", "severity", "_gate", "_get", "_op", "_value")
+
+    def __init__(self, spec: AlertRuleSpec, value: Any) -> None:
+        self.name = spec.name
+        self.severity = spec.severity
+        self._gate = _compile_gate(spec.when)
+        self._get = _compile_getter(spec.field)
+        self._op = _OPS[spec.op]
+        self._value = value
+
+    def _gated(self, status: RobotStatusIn) -> bool:
+        return self._gate is None or self._gate(status)
+
+    @abstractmethod
+    def evaluate(
+        self, state: RuleState, status: RobotStatusIn, ts: float
+    ) -> bool | None: ...
+
+
+class ThresholdRule(CompiledRule):
+    __slots__ = ()
+
+    def evaluate(
+        self, state: RuleState, status: RobotStatusIn, ts: float
+    ) -> bool | None:
+        value = self._get(status)
+        state.value = value
+        return self._gated(status) and self._op(value, self._value)
+
+
+class DurationRule(CompiledRule):
+    __slots__ = ("_for_sec",)
+
+    def __init__(self, spec: AlertRuleSpec, value: Any) -> None:
+        super().__init__(spec, value)
+        self._for_sec = spec.for_sec
+
+    def evaluate(
+        self, state: RuleState, status: RobotStatusIn, ts: float
+    ) -> bool | None:
+        if not (self._gated(status) and self._op(self._get(status), self._value)):
+            # Report how long the condition held up to the resolving message.
+            state.value = 0.0 if state.since is None else ts - state.since
+            state.since = None
+            return False
+        if state.since is None:
+            state.since = ts
+        held = ts - state.since
+        state.value = held
+        return held >= self._for_sec
+
+
+class RateRule(CompiledRule):
+    __slots__ = ("_rate",)
+
+    def __init__(self, spec: AlertRuleSpec, value: Any) -> None:
+        super().__init__(spec, value)
+        self._rate = _ground_speed if spec.field == "location" else _numeric_rate
+
+    def evaluate(
+        self, state: RuleState, status: RobotStatusIn, ts: float
+    ) -> bool | None:
+        sample = self._get(status)
+        prev = state.prev_sample
+        dt = ts - state.prev_ts
+        if prev is not None and dt <= 0:
+            return None
+        state.prev_sample = sample
+        state.prev_ts = ts
+        if prev is None:
+            return None
+        rate = self._rate(prev, sample, dt)
+        state.value = rate
+        return self._gated(status) and self._op(rate, self._value)
+
+
+_RULE_KINDS: dict[str, type[CompiledRule]] = {
+    "threshold": ThresholdRule,
+    "duration": DurationRule,
+    "rate": RateRule,
+}
+
+
+def _compile_getter(field: str) -> Callable[[RobotStatusIn], Any]:
+    if field == "location":
+        return _location_sample
+    if field not in _FIELD_TYPES:
+        raise ValueError(f"Unknown alert field: {field}")
+    return attrgetter(field)
+
+
+def _coerce_value(field: str, op: str, value: Any) -> Any:
+    """Check ``field op value`` against the field's type and coerce ``value``."""
+    if field not in _FIELD_TYPES:
+        raise ValueError(f"Unknown alert field: {field}")
+    if op in _ORDERING_OPS and field not in _NUMERIC_FIELDS:
+        raise ValueError(f"Operator {op} requires a numeric field, got {field}")
+    if value is None:
+        if field == "current_drive_id":
+            return None
+        raise ValueError(f"Missing value for {field}")
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid value {value!r} for {field}")
+    try:
+        return _FIELD_TYPES[field](value)
+    except (AttributeError, TypeError, ValueError) as exc:
+        raise ValueError(f"Invalid value {value!r} for {field}") from exc
+
+
+def _compile_gate(
+    conditions: list[AlertCondition],
+) -> Callable[[RobotStatusIn], bool] | None:
+    if not conditions:
+        return None
+    checks = [
+        (
+            attrgetter(cond.field),
+            _OPS[cond.op],
+            _coerce_value(cond.field, cond.op, cond.value),
+        )
+        for cond in conditions
+    ]
+    if len(checks) == 1:
+        get, op, value = checks[0]
+        return lambda status: op(get(status), value)
+    return lambda status: all(op(get(status), value) for get, op, value in checks)
+
+
+def _location_sample(status: RobotStatusIn) -> tuple[float, float]:
+    location = status.location
+    return (location.latitude, location.longitude)
+
+
+def _ground_speed(
+    prev: tuple[float, float], cur: tuple[float, float], dt: float
+) -> float:
+    # Equirectangular approximation: accurate for the short hops between
+    # consecutive status messages and much cheaper than haversine.
+    lat1 = math.radians(prev[0])
+    lat2 = math.radians(cur[0])
+    x = math.radians(cur[1] - prev[1]) * math.cos((lat1 + lat2) / 2)
+    y = lat2 - lat1
+    return math.hypot(x, y) * EARTH_RADIUS_M / dt
+
+
+def _numeric_rate(prev: float, cur: float, dt: float) -> float:
+    return (cur - prev) / dt
+
+
+def compile_rules(specs: list[dict[str, Any]]) -> list[CompiledRule]:
+    rules: list[CompiledRule] = []
+    names: set[str] = set()
+    for raw in specs:
+        spec = AlertRuleSpec.model_validate(raw)
+        if spec.name in names:
+            raise ValueError(f"Duplicate alert rule name: {spec.name}")
+        if spec.kind == "rate":
+            if spec.field != "location" and spec.field not in _NUMERIC_FIELDS:
+                raise ValueError(
+                    f"rate rules require a numeric field, got {spec.field}"
+                )
+            value = float(spec.value)
+        elif spec.field == "location":
+            raise ValueError("location is only supported by rate rules")
+        else:
+            value = _coerce_value(spec.field, spec.op, spec.value)
+        names.add(spec.name)
+        rules.append(_RULE_KINDS[spec.kind](spec, value))
+    return rules
+
+
+def load_rules(path: str | None) -> list[CompiledRule]:
+    if not path:
+        return compile_rules(DEFAULT_RULES)
+    specs = json.loads(Path(path).read_text(encoding="utf-8"))
+    return compile_rules(specs)
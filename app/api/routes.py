@@ -1,15 +1,23 @@
 import asyncio
 import json
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import AsyncGenerator
 
 from fastapi import APIRouter, HTTPException, Query, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy import text
 
-from app.db.queries import fetch_robot_history
+from app.alerts.engine import ALL_SERIALS
+from app.db.queries import (
+    HISTORY_FIELDS,
+    HistoryProjection,
+    fetch_fleet_snapshot,
+    fetch_robot_history,
+    stream_robot_history_export,
+)
 from app.db.session import AsyncSessionLocal
+from app.export.arrow import MEDIA_TYPES, ExportFormat, encode_export
 from app.sse.manager import SSEManager
 
 logger = logging.getLogger(__name__)
@@ -22,9 +30,20 @@ def _parse_datetime(value: str) -> datetime:
     return datetime.fromisoformat(value)
 
 
-@router.get("/robots/{serial_number}/feed")
-async def robot_feed(serial_number: str, request: Request) -> StreamingResponse:
-    manager: SSEManager = request.app.state.sse_manager
+def _parse_projection(fields: str | None, include_payload: bool) -> HistoryProjection:
+    names = HISTORY_FIELDS
+    if fields is not None:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        if not names:
+            raise HTTPException(status_code=400, detail="fields must not be empty")
+        include_payload = include_payload or "payload" in names
+    try:
+        return HistoryProjection(names, include_payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def _sse_response(manager: SSEManager, serial_number: str) -> StreamingResponse:
     queue = manager.register(serial_number)
 
     async def event_stream() -> AsyncGenerator[str, None]:
@@ -40,6 +59,49 @@ async def robot_feed(serial_number: str, request: Request) -> StreamingResponse:
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 
+@router.get("/robots/{serial_number}/feed")
+async def robot_feed(serial_number: str, request: Request) -> StreamingResponse:
+    return _sse_response(request.app.state.sse_manager, serial_number)
+
+
+@router.get("/alerts/feed")
+async def alert_feed(
+    request: Request, serial_number: str | None = Query(None)
+) -> StreamingResponse:
+    return _sse_response(
+        request.app.state.alert_sse_manager, serial_number or ALL_SERIALS
+    )
+
+
+@router.get("/robots/snapshot")
+async def fleet_snapshot(
+    at: str = Query(...),
+    serial_number: list[str] = Query([]),
+    max_staleness_sec: float | None = Query(None, gt=0),
+    include_payload: bool = Query(False),
+    fields: str | None = Query(None),
+) -> Response:
+    try:
+        at_dt = _parse_datetime(at)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid datetime format")
+    if fields is not None and "serial_number" not in (
+        name.strip() for name in fields.split(",")
+    ):
+        fields = f"serial_number,{fields}"
+    projection = _parse_projection(fields, include_payload)
+    max_staleness = (
+        timedelta(seconds=max_staleness_sec) if max_staleness_sec is not None else None
+    )
+
+    async with AsyncSessionLocal() as session:
+        rows = await fetch_fleet_snapshot(
+            session, at_dt, projection, serial_number, max_staleness
+        )
+
+    return Response(projection.encode(rows), media_type="application/json")
+
+
 @router.get("/robots/{serial_number}/history")
 async def robot_history(
     serial_number: str,
@@ -47,7 +109,8 @@ async def robot_history(
     end_time: str = Query(...),
     include_payload: bool = Query(False),
     limit: int = Query(500, ge=1, le=5000),
-) -> list[dict]:
+    fields: str | None = Query(None),
+) -> Response:
     try:
         start_dt = _parse_datetime(start_time)
         end_dt = _parse_datetime(end_time)
@@ -56,12 +119,50 @@ async def robot_history(
     if end_dt < start_dt:
         raise HTTPException(status_code=400, detail="end_time must be >= start_time")
 
+    projection = _parse_projection(fields, include_payload)
+
     async with AsyncSessionLocal() as session:
-        items = await fetch_robot_history(
-            session, serial_number, start_dt, end_dt, include_payload, limit
+        rows = await fetch_robot_history(
+            session, serial_number, start_dt, end_dt, projection, limit
         )
 
-    return [item.model_dump(by_alias=True) for item in items]
+    return Response(projection.encode(rows), media_type="application/json")
+
+
+@router.get("/export/history")
+async def export_history(
+    start_time: str = Query(...),
+    end_time: str = Query(...),
+    serial_number: list[str] = Query([]),
+    fmt: ExportFormat = Query("arrow", alias="format"),
+    chunk_size: int = Query(65536, ge=1024, le=1_000_000),
+) -> StreamingResponse:
+    try:
+        start_dt = _parse_datetime(start_time)
+        end_dt = _parse_datetime(end_time)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid datetime format")
+    if end_dt < start_dt:
+        raise HTTPException(status_code=400, detail="end_time must be >= start_time")
+
+    async def body() -> AsyncGenerator[bytes, None]:
+        async with AsyncSessionLocal() as session:
+            partitions = stream_robot_history_export(
+                session, serial_number, start_dt, end_dt, chunk_size
+            )
+            async for chunk in encode_export(partitions, fmt):
+                yield chunk
+
+    extension = "arrows" if fmt == "arrow" else "parquet"
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="robot_status_history.{extension}"'
+            )
+        },
+    )
 
 
 @router.get("/health")
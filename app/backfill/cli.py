@@ -0,0 +1,365 @@
+"""Bulk backfill of archived robot status logs into robot_status_history.
+
+Usage:
+    python -m app.backfill.cli logs/ROBOT-0001.jsonl.gz --serial ROBOT-0001
+    python -m app.backfill.cli archive/*.jsonl.gz --workers 8
+
+Each input line is either a status payload (serial taken from
+``serial_number`` / ``robot_id`` or ``--serial``) or a capture record
+``{"topic": "robot/{serial}/status", "payload": ...}`` as written by
+``app.mock.replay capture``. Lines are validated with the same
+``RobotStatusIn`` rules as the MQTT subscriber across a process pool and
+encoded there as COPY CSV, then loaded over ``--copy-connections``
+concurrent COPY streams; rows PostgreSQL rejects are isolated by bisecting
+the batch. Invalid lines go to ``<file>.rejects.jsonl`` and progress
+is checkpointed to ``<file>.checkpoint.json`` after every committed batch,
+so a rerun resumes after the last committed line.
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import IO, Iterator
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.core.logging import configure_logging
+from app.db.errors import is_row_error
+from app.db.migrate import has_unique_serial_ts_index
+from app.db.queries import (
+    copy_robot_status_rows,
+    encode_copy_rows,
+    robot_status_record,
+)
+from app.db.session import engine
+from app.mqtt.subscriber import _classify_validation_error, _extract_serial
+from app.schemas.robot_status import RobotStatusIn
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 20000
+DEFAULT_COPY_CONNECTIONS = 4
+
+# (line number, reason, error, raw line)
+Reject = tuple[int, str, str, str]
+
+
+def _parse_line(line: str, default_serial: str | None) -> tuple[str, dict, str]:
+    entry = json.loads(line)
+    if not isinstance(entry, dict):
+        raise ValueError("line is not a JSON object")
+    if "topic" in entry and "payload" in entry:
+        if not isinstance(entry["topic"], str):
+            raise ValueError("topic is not a string")
+        serial_number = _extract_serial(entry["topic"])
+        payload = entry["payload"]
+        if isinstance(payload, str):
+            payload_json = payload
+            payload = json.loads(payload)
+        else:
+            payload_json = json.dumps(payload)
+    else:
+        serial_number = (
+            entry.get("serial_number") or entry.get("robot_id") or default_serial
+        )
+        payload = entry
+        payload_json = line
+    if not serial_number:
+        raise LookupError("serial number not found")
+    return serial_number, payload, payload_json
+
+
+def validate_batch(
+    start_line: int, lines: list[str], default_serial: str | None
+) -> tuple[list[tuple], list[int], list[Reject]]:
+    """Validate raw lines into COPY CSV rows; runs inside pool workers.
+
+    Returns the encoded rows, the line number of each row, and the rejects.
+    """
+    records: list[tuple] = []
+    record_lines: list[int] = []
+    rejects: list[Reject] = []
+    for offset, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+        line_no = start_line + offset
+        try:
+            serial_number, payload, payload_json = _parse_line(line, default_serial)
+        except json.JSONDecodeError as exc:
+            rejects.append((line_no, "json_decode", str(exc), line))
+            continue
+        except (LookupError, TypeError, ValueError) as exc:
+            rejects.append((line_no, "serial", str(exc), line))
+            continue
+        # Archived rows must carry their own time; RobotStatusIn would
+        # otherwise stamp them with the backfill time.
+        if isinstance(payload, dict) and (
+            payload.get("timestamp", payload.get("ts")) is None
+        ):
+            rejects.append((line_no, "schema", "timestamp is required", line))
+            continue
+        try:
+            status = RobotStatusIn.model_validate(payload)
+        except ValidationError as exc:
+            rejects.append((line_no, _classify_validation_error(exc), str(exc), line))
+            continue
+        records.append(robot_status_record(serial_number, status, payload_json))
+        record_lines.append(line_no)
+    return encode_copy_rows(records), record_lines, rejects
+
+
+def _open_lines(path: Path) -> tuple[IO[bytes], Iterator[str]]:
+    raw = open(path, "rb")
+    if path.suffix == ".gz":
+        stream = gzip.open(raw, "rt", encoding="utf-8")
+    else:
+        stream = open(raw.fileno(), "rt", encoding="utf-8", closefd=False)
+    return raw, stream
+
+
+def _iter_batches(
+    lines: Iterator[str], batch_size: int, skip_lines: int
+) -> Iterator[tuple[int, list[str]]]:
+    line_no = 0
+    batch: list[str] = []
+    start_line = skip_lines + 1
+    for line in lines:
+        line_no += 1
+        if line_no <= skip_lines:
+            continue
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield start_line, batch
+            start_line = line_no + 1
+            batch = []
+    if batch:
+        yield start_line, batch
+
+
+def _checkpoint_path(path: Path) -> Path:
+    return path.with_name(path.name + ".checkpoint.json")
+
+
+def _rejects_path(path: Path) -> Path:
+    return path.with_name(path.name + ".rejects.jsonl")
+
+
+def _load_checkpoint(path: Path) -> dict:
+    checkpoint = _checkpoint_path(path)
+    if not checkpoint.exists():
+        return {"lines_done": 0, "rows": 0, "rejects": 0, "completed": False}
+    return json.loads(checkpoint.read_text(encoding="utf-8"))
+
+
+def _save_checkpoint(path: Path, state: dict) -> None:
+    checkpoint = _checkpoint_path(path)
+    tmp = checkpoint.with_name(checkpoint.name + ".tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, checkpoint)
+
+
+async def _copy_rows(
+    rows: list[bytes], record_lines: list[int], skip_duplicates: bool = True
+) -> list[tuple[int, Exception]]:
+    """COPY encoded rows, bisecting on row-level errors.
+
+    Returns ``(line number, error)`` for each row PostgreSQL rejected;
+    connection and other non-row errors propagate so the batch is retried.
+    """
+    try:
+        async with engine.begin() as conn:
+            await copy_robot_status_rows(conn, rows, skip_duplicates)
+        return []
+    except Exception as exc:
+        if not is_row_error(exc):
+            raise
+        if len(rows) == 1:
+            return [(record_lines[0], exc)]
+    mid = len(rows) // 2
+    failed = await _copy_rows(rows[:mid], record_lines[:mid], skip_duplicates)
+    return failed + await _copy_rows(
+        rows[mid:], record_lines[mid:], skip_duplicates
+    )
+
+
+async def _load_batch(
+    validated: asyncio.Future, copy_slots: asyncio.Semaphore, skip_duplicates: bool
+) -> tuple[int, list[tuple[int, Exception]], list[Reject]]:
+    rows, record_lines, rejects = await validated
+    if not rows:
+        return 0, [], rejects
+    async with copy_slots:
+        failed = await _copy_rows(rows, record_lines, skip_duplicates)
+    return len(rows), failed, rejects
+
+
+async def backfill_file(
+    path: Path,
+    pool: ProcessPoolExecutor,
+    batch_size: int,
+    max_inflight: int,
+    copy_connections: int,
+    default_serial: str | None,
+    skip_duplicates: bool = True,
+) -> dict:
+    """Load one file; batches are COPYed concurrently but checkpointed in order.
+
+    A batch that commits ahead of an earlier one is reloaded on resume and
+    skipped by ``ON CONFLICT DO NOTHING``, so without ``skip_duplicates``
+    batches must be loaded one at a time (``copy_connections=1``).
+    """
+    state = _load_checkpoint(path)
+    if state["completed"]:
+        logger.info("Skipping %s (already completed)", path)
+        return state
+
+    loop = asyncio.get_running_loop()
+    size = max(path.stat().st_size, 1)
+    raw, lines = _open_lines(path)
+    copy_slots = asyncio.Semaphore(copy_connections)
+    pending: deque[tuple[int, list[str], asyncio.Task]] = deque()
+    start = time.monotonic()
+    rows_start = state["rows"]
+
+    async def drain_one() -> None:
+        start_line, batch, task = pending.popleft()
+        loaded, failed, rejects = await task
+        for line_no, exc in failed:
+            raw_line = batch[line_no - start_line].strip()
+            rejects.append((line_no, "db", str(exc), raw_line))
+        rejects.sort()
+        if rejects:
+            with open(_rejects_path(path), "a", encoding="utf-8") as fh:
+                for line_no, reason, error, line in rejects:
+                    fh.write(
+                        json.dumps(
+                            {
+                                "line": line_no,
+                                "reason": reason,
+                                "error": error,
+                                "raw": line,
+                            }
+                        )
+                    )
+                    fh.write("\n")
+        state["lines_done"] = start_line + len(batch) - 1
+        state["rows"] += loaded - len(failed)
+        state["rejects"] += len(rejects)
+        _save_checkpoint(path, state)
+
+        elapsed = max(time.monotonic() - start, 0.001)
+        logger.info(
+            "%s %.1f%% lines=%s rows=%s rejects=%s rate=%.0f rows/s",
+            path.name,
+            min(raw.tell() / size * 100, 100.0),
+            state["lines_done"],
+            state["rows"],
+            state["rejects"],
+            (state["rows"] - rows_start) / elapsed,
+        )
+
+    if state["lines_done"]:
+        logger.info("Resuming %s after line %s", path, state["lines_done"])
+    try:
+        for start_line, batch in _iter_batches(
+            lines, batch_size, state["lines_done"]
+        ):
+            validated = loop.run_in_executor(
+                pool, validate_batch, start_line, batch, default_serial
+            )
+            task = asyncio.create_task(
+                _load_batch(validated, copy_slots, skip_duplicates)
+            )
+            pending.append((start_line, batch, task))
+            if len(pending) >= max_inflight:
+                await drain_one()
+        while pending:
+            await drain_one()
+    finally:
+        for _, _, task in pending:
+            task.cancel()
+        await asyncio.gather(
+            *(task for _, _, task in pending), return_exceptions=True
+        )
+        lines.close()
+        raw.close()
+
+    state["completed"] = True
+    _save_checkpoint(path, state)
+    return state
+
+
+async def run(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.backfill.cli")
+    parser.add_argument("paths", nargs="+", type=Path)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument(
+        "--copy-connections",
+        type=int,
+        default=DEFAULT_COPY_CONNECTIONS,
+        help="concurrent COPY streams to PostgreSQL",
+    )
+    parser.add_argument(
+        "--serial", help="serial number for lines that do not carry one"
+    )
+    args = parser.parse_args(argv)
+    configure_logging(settings.log_level)
+
+    async with engine.connect() as conn:
+        unique_index = await has_unique_serial_ts_index(conn)
+
+    workers = max(args.workers, 1)
+    copy_connections = max(args.copy_connections, 1)
+    if not unique_index:
+        logger.warning(
+            "idx_robot_status_history_serial_ts is not unique; loading with "
+            "one COPY stream and no duplicate detection, so a batch committed "
+            "just before a crash is loaded again on resume "
+            "(run `python -m app.db.migrate` first to avoid this)"
+        )
+        copy_connections = 1
+    total_rows = 0
+    total_rejects = 0
+    start = time.monotonic()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path in args.paths:
+                state = await backfill_file(
+                    path,
+                    pool,
+                    max(args.batch_size, 1),
+                    max(workers, copy_connections) * 2,
+                    copy_connections,
+                    args.serial,
+                    skip_duplicates=unique_index,
+                )
+                total_rows += state["rows"]
+                total_rejects += state["rejects"]
+    finally:
+        await engine.dispose()
+
+    elapsed = max(time.monotonic() - start, 0.001)
+    logger.info(
+        "Backfill finished files=%s rows=%s rejects=%s elapsed=%.1fs",
+        len(args.paths),
+        total_rows,
+        total_rejects,
+        elapsed,
+    )
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
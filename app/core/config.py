@@ -15,7 +15,14 @@ class Settings(BaseSettings):
     mqtt_port: int = 1883
     mqtt_username: str | None = None
     mqtt_password: str | None = None
+    mqtt_at_least_once: bool = False
+    mqtt_client_id: str = "spot-backend-ingest"
+    mqtt_session_expiry_sec: int = 3600
+    mqtt_receive_maximum: int = 1000
+    ingest_batch_size: int = 500
+    ingest_batch_linger_ms: int = 50
     log_level: str = "INFO"
+    alert_rules_path: str | None = None
 
 
 class AppState(BaseModel):
@@ -0,0 +1,16 @@
+# SQLSTATE classes for errors caused by the row itself: 22 data exception
+# (e.g. invalid JSON text, NUL bytes) and 23 integrity constraint violation.
+_ROW_ERROR_CLASSES = {"22", "23"}
+
+
+def is_row_error(exc: BaseException | None) -> bool:
+    """True when PostgreSQL rejected the data rather than the connection failing.
+
+    Handles both raw asyncpg errors and SQLAlchemy ``DBAPIError`` wrappers.
+    """
+    while exc is not None:
+        sqlstate = getattr(exc, "sqlstate", None)
+        if isinstance(sqlstate, str):
+            return sqlstate[:2] in _ROW_ERROR_CLASSES
+        exc = getattr(exc, "orig", None) or exc.__cause__
+    return False
@@ -0,0 +1,88 @@
+"""Make ``idx_robot_status_history_serial_ts`` unique on an existing database.
+
+``Base.metadata.create_all`` creates the unique index on fresh databases but
+never alters an existing one. ``MQTT_AT_LEAST_ONCE`` ingest requires it for
+``ON CONFLICT (serial_number, ts)``; default ingest and the backfill CLI fall
+back to plain inserts without it. Run once, with the API stopped:
+
+    python -m app.db.migrate
+
+Duplicate ``(serial_number, ts)`` rows are removed (the lowest ``id`` is
+kept), a unique index is built with ``CREATE UNIQUE INDEX CONCURRENTLY`` and
+swapped in under the original name.
+"""
+
+import asyncio
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.config import settings
+from app.core.logging import configure_logging
+from app.db.models import RobotStatusHistory
+
+logger = logging.getLogger(__name__)
+
+TABLE = RobotStatusHistory.__tablename__
+INDEX = "idx_robot_status_history_serial_ts"
+_NEW_INDEX = f"{INDEX}_unique"
+
+
+async def has_unique_serial_ts_index(conn: AsyncConnection) -> bool:
+    result = await conn.execute(
+        text(
+            "SELECT indisunique AND indisvalid FROM pg_index "
+            "WHERE indexrelid = to_regclass(:name)"
+        ),
+        {"name": INDEX},
+    )
+    return bool(result.scalar())
+
+
+async def migrate_unique_serial_ts_index(engine: AsyncEngine) -> None:
+    async with engine.connect() as conn:
+        if await has_unique_serial_ts_index(conn):
+            logger.info("%s is already unique", INDEX)
+            return
+
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            text(
+                f"DELETE FROM {TABLE} a USING {TABLE} b "
+                "WHERE a.serial_number = b.serial_number "
+                "AND a.ts = b.ts AND a.id > b.id"
+            )
+        )
+        logger.info("Removed %s duplicate (serial_number, ts) rows", result.rowcount)
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"DROP INDEX IF EXISTS {_NEW_INDEX}"))
+        logger.info("Building %s concurrently", _NEW_INDEX)
+        await conn.execute(
+            text(
+                f"CREATE UNIQUE INDEX CONCURRENTLY {_NEW_INDEX} "
+                f"ON {TABLE} (serial_number, ts DESC)"
+            )
+        )
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {INDEX}"))
+        await conn.execute(text(f"ALTER INDEX {_NEW_INDEX} RENAME TO {INDEX}"))
+    logger.info("%s is now unique", INDEX)
+
+
+async def run() -> None:
+    from app.db.session import engine
+
+    configure_logging(settings.log_level)
+    try:
+        await migrate_unique_serial_ts_index(engine)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
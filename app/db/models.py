@@ -43,4 +43,5 @@ Index(
     "idx_robot_status_history_serial_ts",
     RobotStatusHistory.serial_number,
     RobotStatusHistory.ts.desc(),
+    unique=True,
 )
@@ -1,68 +1,348 @@
-from datetime import datetime
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Any, AsyncIterator, Callable, Sequence
+from uuid import UUID
 
-from sqlalchemy import insert, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import (
+    Row,
+    Select,
+    String,
+    cast,
+    func,
+    literal,
+    select,
+    text,
+    true,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 
 from app.db.models import RobotStatusHistory
-from app.schemas.robot_status import Location, RobotStatusIn, RobotStatusOut
+from app.schemas.robot_status import RobotStatusIn
 
+_history = RobotStatusHistory.__table__.c
 
-async def insert_robot_status(
-    session: AsyncSession,
-    serial_number: str,
-    status: RobotStatusIn,
-    payload: dict | None,
+# Public history field name -> columns it needs, in output order.
+_FIELD_COLUMNS = {
+    "serial_number": (_history.serial_number,),
+    "timestamp": (_history.ts,),
+    "battery_level": (_history.battery_level,),
+    "battery_status": (_history.battery_status,),
+    "driving_status": (_history.driving_status,),
+    "current_drive_id": (_history.current_drive_id,),
+    "location": (_history.latitude, _history.longitude, _history.height),
+    "payload": (_history.payload,),
+}
+HISTORY_FIELDS = tuple(_FIELD_COLUMNS)
+
+# Columnar export layout; drive ids are cast in SQL so rows arrive as str.
+EXPORT_COLUMNS = (
+    _history.serial_number,
+    _history.ts,
+    _history.battery_level,
+    _history.battery_status,
+    _history.driving_status,
+    cast(_history.current_drive_id, String).label("current_drive_id"),
+    _history.latitude,
+    _history.longitude,
+    _history.height,
+)
+
+ROBOT_STATUS_COPY_COLUMNS = (
+    "serial_number",
+    "ts",
+    "battery_level",
+    "battery_status",
+    "driving_status",
+    "current_drive_id",
+    "latitude",
+    "longitude",
+    "height",
+    "payload",
+)
+
+_STAGING_TABLE = "robot_status_history_staging"
+
+
+def robot_status_record(
+    serial_number: str, status: RobotStatusIn, payload_json: str | None
+) -> tuple:
+    """Build a row tuple ordered as ``ROBOT_STATUS_COPY_COLUMNS``."""
+    location = status.location
+    return (
+        serial_number,
+        status.ts,
+        status.battery_level,
+        status.battery_status.value,
+        status.driving_status.value,
+        status.current_drive_id,
+        location.latitude,
+        location.longitude,
+        location.height,
+        payload_json,
+    )
+
+
+def encode_copy_rows(records: Sequence[tuple]) -> list[bytes]:
+    """Encode ``robot_status_record`` tuples as COPY CSV lines, one per row.
+
+    Encoding happens where the records are built (the backfill pool
+    workers), so the loading process only concatenates bytes.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    ends: list[int] = []
+    for record in records:
+        writer.writerow(record)
+        ends.append(buf.tell())
+    data = buf.getvalue()
+    rows: list[bytes] = []
+    start = 0
+    for end in ends:
+        rows.append(data[start:end].encode("utf-8"))
+        start = end
+    return rows
+
+
+async def copy_robot_status_rows(
+    conn: AsyncConnection, rows: Sequence[bytes], skip_duplicates: bool = True
 ) -> None:
-    await session.execute(
-        insert(RobotStatusHistory).values(
-            serial_number=serial_number,
-            ts=status.ts,
-            battery_level=status.battery_level,
-            battery_status=status.battery_status.value,
-            driving_status=status.driving_status.value,
-            current_drive_id=status.current_drive_id,
-            latitude=status.location.latitude,
-            longitude=status.location.longitude,
-            height=status.location.height,
-            payload=payload,
+    """COPY ``encode_copy_rows`` output on the connection's transaction.
+
+    Rows are copied into a transaction-scoped staging table and moved over;
+    with ``skip_duplicates`` (requires the unique (serial_number, ts) index)
+    that uses ``ON CONFLICT DO NOTHING`` so reloading a batch is idempotent.
+    """
+    columns = ", ".join(ROBOT_STATUS_COPY_COLUMNS)
+    # Only the copied columns: staging rows must not draw ``id`` values.
+    await conn.execute(
+        text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {_STAGING_TABLE} "
+            "ON COMMIT DELETE ROWS AS "
+            f"SELECT {columns} FROM {RobotStatusHistory.__tablename__} "
+            "WITH NO DATA"
+        )
+    )
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_to_table(
+        _STAGING_TABLE,
+        source=b"".join(rows),
+        columns=ROBOT_STATUS_COPY_COLUMNS,
+        format="csv",
+    )
+    on_conflict = " ON CONFLICT (serial_number, ts) DO NOTHING"
+    await conn.execute(
+        text(
+            f"INSERT INTO {RobotStatusHistory.__tablename__} ({columns}) "
+            f"SELECT {columns} FROM {_STAGING_TABLE}"
+            + (on_conflict if skip_duplicates else "")
         )
     )
 
 
+async def insert_robot_statuses(
+    session: AsyncSession,
+    rows: Sequence[tuple[str, RobotStatusIn, dict | None]],
+    skip_duplicates: bool = True,
+) -> list[tuple[str, datetime]]:
+    """Insert a batch of statuses and return the (serial, ts) key of each row stored.
+
+    With ``skip_duplicates`` (requires the unique (serial_number, ts) index)
+    rows already stored for (serial, ts) are skipped and not returned.
+    """
+    stmt = insert(RobotStatusHistory)
+    if skip_duplicates:
+        stmt = stmt.on_conflict_do_nothing(index_elements=["serial_number", "ts"])
+    stmt = stmt.returning(RobotStatusHistory.serial_number, RobotStatusHistory.ts)
+    result = await session.execute(
+        stmt,
+        [
+            {
+                "serial_number": serial_number,
+                "ts": status.ts,
+                "battery_level": status.battery_level,
+                "battery_status": status.battery_status.value,
+                "driving_status": status.driving_status.value,
+                "current_drive_id": status.current_drive_id,
+                "latitude": status.location.latitude,
+                "longitude": status.location.longitude,
+                "height": status.location.height,
+                "payload": payload,
+            }
+            for serial_number, status, payload in rows
+        ],
+    )
+    return [(row.serial_number, row.ts) for row in result]
+
+
+class HistoryProjection:
+    """Columns selected for the requested history fields and their JSON encoder.
+
+    Rows are plain Core tuples laid out as ``columns``; ``encode`` writes them
+    straight to JSON without building ORM instances or pydantic models.
+    """
+
+    def __init__(self, fields: Sequence[str], include_payload: bool) -> None:
+        unknown = [name for name in fields if name not in _FIELD_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+        self.columns: list = []
+        self._getters: list[tuple[str, Callable[[Row], Any]]] = []
+        for name in dict.fromkeys(fields):
+            if name == "payload" and not include_payload:
+                self._getters.append((name, _null))
+                continue
+            index = len(self.columns)
+            self.columns.extend(_FIELD_COLUMNS[name])
+            if name == "location":
+                self._getters.append((name, _location_getter(index)))
+            else:
+                self._getters.append((name, itemgetter(index)))
+
+    def encode(self, rows: Sequence[Row]) -> bytes:
+        getters = self._getters
+        items = [{key: get(row) for key, get in getters} for row in rows]
+        return json.dumps(items, default=_json_default).encode("utf-8")
+
+
+def _null(row: Row) -> None:
+    return None
+
+
+def _location_getter(index: int) -> Callable[[Row], dict[str, float]]:
+    def get(row: Row) -> dict[str, float]:
+        return {
+            "latitude": row[index],
+            "longitude": row[index + 1],
+            "height": row[index + 2],
+        }
+
+    return get
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
 async def fetch_robot_history(
     session: AsyncSession,
     serial_number: str,
     start_time: datetime,
     end_time: datetime,
-    include_payload: bool,
+    projection: HistoryProjection,
     limit: int,
-) -> list[RobotStatusOut]:
+) -> Sequence[Row]:
     stmt = (
-        select(RobotStatusHistory)
+        select(*projection.columns)
         .where(RobotStatusHistory.serial_number == serial_number)
         .where(RobotStatusHistory.ts.between(start_time, end_time))
         .order_by(RobotStatusHistory.ts.asc())
         .limit(limit)
     )
     result = await session.execute(stmt)
-    rows = result.scalars().all()
-
-    items: list[RobotStatusOut] = []
-    for row in rows:
-        items.append(
-            RobotStatusOut(
-                serial_number=row.serial_number,
-                ts=row.ts,
-                battery_level=row.battery_level,
-                battery_status=row.battery_status,
-                driving_status=row.driving_status,
-                current_drive_id=row.current_drive_id,
-                location=Location(
-                    latitude=row.latitude,
-                    longitude=row.longitude,
-                    height=row.height,
-                ),
-                payload=row.payload if include_payload else None,
+    return result.all()
+
+
+def _all_serials_cte():
+    """Distinct serials via a recursive skip scan of the (serial, ts) index."""
+    other = RobotStatusHistory.__table__.alias("other")
+    first = (
+        select(_history.serial_number)
+        .order_by(_history.serial_number)
+        .limit(1)
+        .subquery("first_serial")
+    )
+    serials = select(first.c.serial_number).cte("serials", recursive=True)
+    next_serial = (
+        select(other.c.serial_number)
+        .where(other.c.serial_number > serials.c.serial_number)
+        .order_by(other.c.serial_number)
+        .limit(1)
+        .scalar_subquery()
+    )
+    return serials.union_all(
+        select(next_serial).where(serials.c.serial_number.is_not(None))
+    )
+
+
+def fleet_snapshot_stmt(
+    at: datetime,
+    projection: HistoryProjection,
+    serial_numbers: Sequence[str],
+    max_staleness: timedelta | None,
+) -> Select:
+    if serial_numbers:
+        # One array parameter instead of a VALUES list keeps thousands of
+        # serials within the driver's bind-parameter limit.
+        serials = (
+            func.unnest(
+                literal(list(dict.fromkeys(serial_numbers)), ARRAY(String))
             )
+            .table_valued("serial_number")
+            .render_derived(name="serials")
         )
-    return items
+    else:
+        serials = _all_serials_cte()
+
+    latest = (
+        select(*projection.columns)
+        .where(_history.serial_number == serials.c.serial_number)
+        .where(_history.ts <= at)
+    )
+    if max_staleness is not None:
+        latest = latest.where(_history.ts >= at - max_staleness)
+    latest = latest.order_by(_history.ts.desc()).limit(1).lateral("latest")
+
+    return (
+        select(*latest.c)
+        .select_from(serials.join(latest, true()))
+        .order_by(serials.c.serial_number)
+    )
+
+
+async def fetch_fleet_snapshot(
+    session: AsyncSession,
+    at: datetime,
+    projection: HistoryProjection,
+    serial_numbers: Sequence[str],
+    max_staleness: timedelta | None,
+) -> Sequence[Row]:
+    """Latest row at or before ``at`` per serial, one index probe per serial."""
+    stmt = fleet_snapshot_stmt(at, projection, serial_numbers, max_staleness)
+    result = await session.execute(stmt)
+    return result.all()
+
+
+def export_robot_history_stmt(
+    serial_numbers: Sequence[str],
+    start_time: datetime,
+    end_time: datetime,
+) -> Select:
+    stmt = select(*EXPORT_COLUMNS).where(_history.ts.between(start_time, end_time))
+    if serial_numbers:
+        stmt = stmt.where(_history.serial_number.in_(serial_numbers))
+    # A backward scan of idx_robot_status_history_serial_ts (serial ASC,
+    # ts DESC) yields exactly this order, so rows stream without a sort.
+    return stmt.order_by(_history.serial_number.desc(), _history.ts.asc())
+
+
+async def stream_robot_history_export(
+    session: AsyncSession,
+    serial_numbers: Sequence[str],
+    start_time: datetime,
+    end_time: datetime,
+    chunk_size: int,
+) -> AsyncIterator[Sequence[Row]]:
+    """Yield export rows in chunks from a server-side cursor."""
+    stmt = export_robot_history_stmt(serial_numbers, start_time, end_time)
+    result = await session.stream(stmt.execution_options(yield_per=chunk_size))
+    async for partition in result.partitions():
+        yield partition
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from typing import AsyncIterator, Literal, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import Row
+
+ExportFormat = Literal["arrow", "parquet"]
+
+MEDIA_TYPES: dict[str, str] = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+_BATTERY_STATUSES = pa.array(["CHARGING", "DISCHARGING"])
+_DRIVING_STATUSES = pa.array(["IDLE", "MOVING"])
+
+# Column order matches app.db.queries.EXPORT_COLUMNS.
+EXPORT_SCHEMA = pa.schema(
+    [
+        ("serial_number", pa.dictionary(pa.int32(), pa.string())),
+        ("ts", pa.timestamp("us", tz="UTC")),
+        ("battery_level", pa.int32()),
+        ("battery_status", pa.dictionary(pa.int8(), pa.string())),
+        ("driving_status", pa.dictionary(pa.int8(), pa.string())),
+        ("current_drive_id", pa.string()),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+        ("height", pa.float64()),
+    ]
+)
+
+
+class _ChunkSink:
+    """Write-only file object that returns the bytes written since the last drain."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        return None
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _enum_array(values: Sequence[str], dictionary: pa.Array) -> pa.DictionaryArray:
+    # A fixed dictionary keeps every batch on the same dictionary, so the IPC
+    # stream never has to emit a replacement.
+    indices = pc.index_in(pa.array(values, pa.string()), value_set=dictionary)
+    return pa.DictionaryArray.from_arrays(indices.cast(pa.int8()), dictionary)
+
+
+def rows_to_batch(rows: Sequence[Row]) -> pa.RecordBatch:
+    """Convert a chunk of ``EXPORT_COLUMNS`` rows column-wise into a record batch."""
+    (
+        serials,
+        ts,
+        battery_level,
+        battery_status,
+        driving_status,
+        current_drive_id,
+        latitude,
+        longitude,
+        height,
+    ) = zip(*rows)
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(serials, pa.string()).dictionary_encode(),
+            pa.array(ts, pa.timestamp("us", tz="UTC")),
+            pa.array(battery_level, pa.int32()),
+            _enum_array(battery_status, _BATTERY_STATUSES),
+            _enum_array(driving_status, _DRIVING_STATUSES),
+            pa.array(current_drive_id, pa.string()),
+            pa.array(latitude, pa.float64()),
+            pa.array(longitude, pa.float64()),
+            pa.array(height, pa.float64()),
+        ],
+        schema=EXPORT_SCHEMA,
+    )
+
+
+async def encode_export(
+    partitions: AsyncIterator[Sequence[Row]], fmt: ExportFormat
+) -> AsyncIterator[bytes]:
+    """Encode row partitions as an Arrow IPC stream or Parquet file, chunk by chunk."""
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, EXPORT_SCHEMA, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, EXPORT_SCHEMA)
+    try:
+        async for rows in partitions:
+            if not rows:
+                continue
+            batch = rows_to_batch(rows)
+            if fmt == "parquet":
+                writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    data = sink.drain()
+    if data:
+        yield data
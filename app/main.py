@@ -6,12 +6,19 @@ from fastapi import FastAPI
 from prometheus_fastapi_instrumentator import Instrumentator
 from sqlalchemy import text
 
+from app.alerts.engine import AlertEngine
+from app.alerts.rules import load_rules
 from app.api.routes import router
 from app.core.config import settings
 from app.core.logging import configure_logging
+from app.db.migrate import has_unique_serial_ts_index
 from app.db.models import Base
 from app.db.session import engine
-from app.metrics import ACTIVE_REFRESH_SEC, recompute_active_stale
+from app.metrics import (
+    ACTIVE_REFRESH_SEC,
+    alert_sse_subscribers,
+    recompute_active_stale,
+)
 from app.mqtt.subscriber import mqtt_subscriber
 from app.sse.manager import SSEManager
 
@@ -21,11 +28,33 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     configure_logging(settings.log_level)
     app.state.sse_manager = SSEManager()
+    app.state.alert_sse_manager = SSEManager(alert_sse_subscribers)
+    app.state.alert_engine = AlertEngine(
+        load_rules(settings.alert_rules_path), app.state.alert_sse_manager
+    )
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
         await conn.execute(text("SELECT 1"))
+        unique_index = await has_unique_serial_ts_index(conn)
+    if not unique_index:
+        # Redelivered messages can only be dropped through the unique index.
+        if settings.mqtt_at_least_once:
+            raise RuntimeError(
+                "MQTT_AT_LEAST_ONCE requires a unique "
+                "idx_robot_status_history_serial_ts; "
+                "run `python -m app.db.migrate` before starting the API"
+            )
+        logger.warning(
+            "idx_robot_status_history_serial_ts is not unique; inserting "
+            "without duplicate detection (run `python -m app.db.migrate`)"
+        )
     app.state.mqtt_task = asyncio.create_task(
-        mqtt_subscriber(settings, app.state.sse_manager)
+        mqtt_subscriber(
+            settings,
+            app.state.sse_manager,
+            app.state.alert_engine,
+            skip_duplicates=unique_index,
+        )
     )
     app.state.metrics_task = None
     if ACTIVE_REFRESH_SEC > 0:
@@ -30,6 +30,10 @@ db_insert_fail_total = Counter(
     "db_insert_fail_total",
     "Total DB insert failures",
 )
+db_insert_duplicate_total = Counter(
+    "db_insert_duplicate_total",
+    "Rows skipped because (serial_number, ts) was already stored",
+)
 robot_status_updates_total = Counter(
     "robot_status_updates_total",
     "Robot status updates by driving status",
@@ -52,6 +56,30 @@ sse_subscribers = Gauge(
     "sse_subscribers",
     "Current SSE subscribers",
 )
+alert_sse_subscribers = Gauge(
+    "alert_sse_subscribers",
+    "Current alert SSE subscribers",
+)
+alerts_fired_total = Counter(
+    "alerts_fired_total",
+    "Alerts fired by rule",
+    ["rule"],
+)
+alerts_resolved_total = Counter(
+    "alerts_resolved_total",
+    "Alerts resolved by rule",
+    ["rule"],
+)
+alert_rule_errors_total = Counter(
+    "alert_rule_errors_total",
+    "Alert rule evaluation failures by rule",
+    ["rule"],
+)
+alerts_active = Gauge(
+    "alerts_active",
+    "Currently firing alerts by rule",
+    ["rule"],
+)
 
 _last_seen: dict[str, float] = {}
 
@@ -25,6 +25,7 @@ def _load_settings() -> dict:
         "mqtt_port": int(os.getenv("MQTT_PORT", "1883")),
         "mqtt_username": os.getenv("MQTT_USERNAME"),
         "mqtt_password": os.getenv("MQTT_PASSWORD"),
+        "mqtt_qos": int(os.getenv("MQTT_QOS", "1")),
         "robot_count": int(os.getenv("ROBOT_COUNT", "2")),
         "publish_interval_sec": float(os.getenv("PUBLISH_INTERVAL_SEC", "1.0")),
         "invalid_rate": float(os.getenv("INVALID_RATE", "0.0")),
@@ -129,7 +130,9 @@ async def _publish_loop(client: Client, settings: dict) -> None:
         payload["robot_id"] = serial
         payload = _maybe_make_invalid(payload, invalid_rate)
         topic = f"robot/{serial}/status"
-        await client.publish(topic, payload=json.dumps(payload))
+        await client.publish(
+            topic, payload=json.dumps(payload), qos=settings["mqtt_qos"]
+        )
         total_published += 1
 
         now = time.monotonic()
@@ -0,0 +1,344 @@
+"""Replay recorded robot telemetry to MQTT, or capture live traffic for replay.
+
+Usage:
+    python -m app.mock.replay capture --output capture.jsonl.gz
+    python -m app.mock.replay jsonl capture.jsonl.gz --speed 10
+    python -m app.mock.replay db --serial ROBOT-0001 --start 2025-12-01T00:00:00Z
+
+Replay keeps the original inter-arrival timing divided by ``--speed``
+(``--speed 0`` publishes as fast as possible). Messages are spread across
+``--connections`` MQTT clients, sharded by serial so per-robot order holds.
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, TextIO
+
+from aiomqtt import Client, MqttError, ProtocolVersion
+
+logger = logging.getLogger(__name__)
+
+STATUS_TOPIC = "robot/+/status"
+QUEUE_SIZE = 1000
+STATS_INTERVAL_SEC = 5.0
+
+# (original timestamp in epoch seconds, topic, payload)
+Record = tuple[float, str, str]
+
+
+def _load_settings() -> dict:
+    return {
+        "mqtt_host": os.getenv("MQTT_HOST", "localhost"),
+        "mqtt_port": int(os.getenv("MQTT_PORT", "1883")),
+        "mqtt_username": os.getenv("MQTT_USERNAME"),
+        "mqtt_password": os.getenv("MQTT_PASSWORD"),
+        "mqtt_qos": int(os.getenv("MQTT_QOS", "1")),
+        "database_url": os.getenv("DATABASE_URL"),
+        "log_level": os.getenv("LOG_LEVEL", "INFO"),
+    }
+
+
+def _parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _isoformat(ts: datetime) -> str:
+    return ts.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _client(settings: dict) -> Client:
+    return Client(
+        hostname=settings["mqtt_host"],
+        port=settings["mqtt_port"],
+        username=settings["mqtt_username"],
+        password=settings["mqtt_password"],
+        protocol=ProtocolVersion.V5,
+    )
+
+
+def _open_text(path: Path, mode: str) -> TextIO:
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _row_payload(row) -> dict:
+    if row.payload:
+        return row.payload
+    return {
+        "timestamp": _isoformat(row.ts),
+        "battery_level": row.battery_level,
+        "battery_status": row.battery_status,
+        "driving_status": row.driving_status,
+        "current_drive_id": (
+            str(row.current_drive_id) if row.current_drive_id else None
+        ),
+        "location": {
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+            "height": row.height,
+        },
+    }
+
+
+async def _iter_jsonl(path: Path) -> AsyncIterator[Record]:
+    with _open_text(path, "r") as fh:
+        for line_no, line in enumerate(fh, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                yield float(entry["ts"]), entry["topic"], entry["payload"]
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                logger.warning("Skipping malformed capture line %s", line_no)
+
+
+async def _iter_db(
+    database_url: str,
+    serials: list[str],
+    start_time: datetime | None,
+    end_time: datetime | None,
+    chunk_size: int,
+) -> AsyncIterator[Record]:
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.db.models import RobotStatusHistory
+
+    stmt = select(RobotStatusHistory.__table__).order_by(RobotStatusHistory.ts.asc())
+    if serials:
+        stmt = stmt.where(RobotStatusHistory.serial_number.in_(serials))
+    if start_time is not None:
+        stmt = stmt.where(RobotStatusHistory.ts >= start_time)
+    if end_time is not None:
+        stmt = stmt.where(RobotStatusHistory.ts <= end_time)
+
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.connect() as conn:
+            result = await conn.stream(
+                stmt.execution_options(yield_per=chunk_size)
+            )
+            async for row in result:
+                yield (
+                    row.ts.timestamp(),
+                    f"robot/{row.serial_number}/status",
+                    json.dumps(_row_payload(row)),
+                )
+    finally:
+        await engine.dispose()
+
+
+def _rewrite_timestamp(payload: str) -> str:
+    try:
+        data = json.loads(payload)
+    except json.JSONDecodeError:
+        return payload
+    if not isinstance(data, dict):
+        return payload
+    data["timestamp"] = _isoformat(datetime.now(timezone.utc))
+    return json.dumps(data)
+
+
+async def _publish_worker(
+    settings: dict, queue: asyncio.Queue[tuple[str, str] | None], stats: dict
+) -> None:
+    async with _client(settings) as client:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            topic, payload = item
+            await client.publish(topic, payload=payload, qos=settings["mqtt_qos"])
+            stats["published"] += 1
+
+
+async def _put(
+    queue: asyncio.Queue[tuple[str, str] | None],
+    item: tuple[str, str] | None,
+    worker: asyncio.Task,
+) -> None:
+    """Queue ``item`` for ``worker``; re-raise the worker's error if it stops."""
+    if not worker.done():
+        try:
+            queue.put_nowait(item)
+            return
+        except asyncio.QueueFull:
+            put = asyncio.ensure_future(queue.put(item))
+            done, _ = await asyncio.wait(
+                {put, worker}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if put in done:
+                return
+            put.cancel()
+    worker.result()
+    raise RuntimeError("Publish worker stopped before replay finished")
+
+
+async def replay(
+    settings: dict,
+    records: AsyncIterator[Record],
+    speed: float,
+    connections: int,
+    rewrite_ts: bool,
+) -> int:
+    connections = max(connections, 1)
+    queues: list[asyncio.Queue[tuple[str, str] | None]] = [
+        asyncio.Queue(maxsize=QUEUE_SIZE) for _ in range(connections)
+    ]
+    stats = {"published": 0}
+    workers = [
+        asyncio.create_task(_publish_worker(settings, queue, stats))
+        for queue in queues
+    ]
+    logger.info("Replay started speed=%s connections=%s", speed or "max", connections)
+
+    first_ts: float | None = None
+    start = time.monotonic()
+    last_stats = start
+    try:
+        async for ts, topic, payload in records:
+            if first_ts is None:
+                first_ts = ts
+            if speed > 0:
+                delay = start + (ts - first_ts) / speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if rewrite_ts:
+                payload = _rewrite_timestamp(payload)
+            # Shard by serial so a robot's messages stay ordered on one connection.
+            shard = zlib.crc32(topic.encode()) % connections
+            await _put(queues[shard], (topic, payload), workers[shard])
+
+            now = time.monotonic()
+            if now - last_stats >= STATS_INTERVAL_SEC:
+                logger.info(
+                    "Replayed total=%s rate=%.2f msg/s",
+                    stats["published"],
+                    stats["published"] / max(now - start, 0.001),
+                )
+                last_stats = now
+        for queue, worker in zip(queues, workers):
+            await _put(queue, None, worker)
+        await asyncio.gather(*workers)
+    finally:
+        for worker in workers:
+            worker.cancel()
+
+    elapsed = max(time.monotonic() - start, 0.001)
+    logger.info(
+        "Replay finished total=%s elapsed=%.2fs rate=%.2f msg/s",
+        stats["published"],
+        elapsed,
+        stats["published"] / elapsed,
+    )
+    return stats["published"]
+
+
+async def capture(settings: dict, output: Path, topic: str) -> None:
+    total = 0
+    backoff = 1
+    with _open_text(output, "a") as fh:
+        while True:
+            try:
+                async with _client(settings) as client:
+                    await client.subscribe(topic)
+                    logger.info("Capturing %s to %s", topic, output)
+                    backoff = 1
+                    async for message in client.messages:
+                        payload = message.payload
+                        if isinstance(payload, (bytes, bytearray)):
+                            payload = payload.decode("utf-8", errors="replace")
+                        fh.write(
+                            json.dumps(
+                                {
+                                    "ts": time.time(),
+                                    "topic": message.topic.value,
+                                    "payload": payload,
+                                }
+                            )
+                        )
+                        fh.write("\n")
+                        total += 1
+                        if total % QUEUE_SIZE == 0:
+                            fh.flush()
+                            logger.info("Captured total=%s", total)
+            except MqttError as exc:
+                fh.flush()
+                logger.warning("MQTT error: %s. reconnecting in %ss", exc, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.mock.replay")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    cap = sub.add_parser("capture", help="record live MQTT traffic to JSONL")
+    cap.add_argument("--output", type=Path, required=True)
+    cap.add_argument("--topic", default=STATUS_TOPIC)
+
+    for name in ("jsonl", "db"):
+        rep = sub.add_parser(name, help=f"replay from {name}")
+        rep.add_argument(
+            "--speed",
+            type=float,
+            default=1.0,
+            help="timing scale factor; 0 publishes as fast as possible",
+        )
+        rep.add_argument("--connections", type=int, default=1)
+        rep.add_argument(
+            "--rewrite-ts",
+            action="store_true",
+            help="replace payload timestamps with the publish time",
+        )
+        if name == "jsonl":
+            rep.add_argument("path", type=Path)
+        else:
+            rep.add_argument("--serial", action="append", default=[])
+            rep.add_argument("--start", type=_parse_datetime)
+            rep.add_argument("--end", type=_parse_datetime)
+            rep.add_argument("--chunk-size", type=int, default=5000)
+    return parser
+
+
+async def run(argv: list[str] | None = None) -> None:
+    args = _build_parser().parse_args(argv)
+    settings = _load_settings()
+    logging.basicConfig(
+        level=settings["log_level"],
+        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+    )
+
+    if args.mode == "capture":
+        await capture(settings, args.output, args.topic)
+        return
+
+    if args.mode == "jsonl":
+        records = _iter_jsonl(args.path)
+    else:
+        if not settings["database_url"]:
+            raise SystemExit("DATABASE_URL is required for db replay")
+        records = _iter_db(
+            settings["database_url"],
+            args.serial,
+            args.start,
+            args.end,
+            args.chunk_size,
+        )
+    await replay(settings, records, args.speed, args.connections, args.rewrite_ts)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
@@ -1,17 +1,25 @@
 import asyncio
 import json
 import logging
+import time
+from collections import Counter
 
-from aiomqtt import Client, MqttError, ProtocolVersion
+import paho.mqtt.client as mqtt
+from aiomqtt import Client, Message, MqttError, ProtocolVersion
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
 from pydantic import ValidationError
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.alerts.engine import AlertEngine
 from app.core.config import Settings
-from app.db.queries import insert_robot_status
+from app.db.errors import is_row_error
+from app.db.queries import insert_robot_statuses
 from app.db.session import AsyncSessionLocal
 from app.schemas.robot_status import RobotStatusIn, RobotStatusOut
 from app.sse.manager import SSEManager
 from app.metrics import (
+    db_insert_duplicate_total,
     db_insert_fail_total,
     db_insert_total,
     mqtt_messages_received_total,
@@ -42,8 +50,210 @@ def _classify_validation_error(exc: ValidationError) -> str:
     return "schema"
 
 
-async def mqtt_subscriber(settings: Settings, sse_manager: SSEManager) -> None:
+class _IngestBatch:
+    """Validated rows and received message ids awaiting one DB commit."""
+
+    def __init__(self) -> None:
+        self.rows: list[tuple[str, RobotStatusIn, dict]] = []
+        self.acks: list[tuple[int, int]] = []
+        self.started = 0.0
+
+    def __len__(self) -> int:
+        return len(self.acks)
+
+    def add(
+        self, message: Message, row: tuple[str, RobotStatusIn, dict] | None
+    ) -> None:
+        if not self.acks:
+            self.started = time.monotonic()
+        self.acks.append((message.mid, message.qos))
+        if row is not None:
+            self.rows.append(row)
+
+    def clear(self) -> None:
+        self.rows.clear()
+        self.acks.clear()
+
+
+def _paho_client(client: Client) -> mqtt.Client:
+    """Return the paho client behind ``client`` for manual PUBACKs.
+
+    aiomqtt 2.3.0 has no public manual-ack API, so ``manual_ack_set`` and
+    ``ack`` go through its private ``_client``; this depends on the version
+    pinned in requirements.txt and must be rechecked when upgrading aiomqtt.
+    """
+    return client._client
+
+
+def _client(settings: Settings) -> Client:
+    options: dict = {}
+    if settings.mqtt_at_least_once:
+        properties = Properties(PacketTypes.CONNECT)
+        properties.SessionExpiryInterval = settings.mqtt_session_expiry_sec
+        properties.ReceiveMaximum = settings.mqtt_receive_maximum
+        options = {
+            "identifier": settings.mqtt_client_id,
+            "clean_start": False,
+            "properties": properties,
+        }
+    client = Client(
+        hostname=settings.mqtt_host,
+        port=settings.mqtt_port,
+        username=settings.mqtt_username,
+        password=settings.mqtt_password,
+        protocol=ProtocolVersion.V5,
+        **options,
+    )
+    if settings.mqtt_at_least_once:
+        # PUBACKs are sent by _flush_batch once the rows are committed.
+        _paho_client(client).manual_ack_set(True)
+    return client
+
+
+def _parse_message(message: Message) -> tuple[str, RobotStatusIn, dict] | None:
+    logger.debug(
+        "Message received: topic=%s payload=%s",
+        message.topic.value,
+        message.payload,
+    )
+    serial_number = _extract_serial(message.topic.value)
+    if not serial_number:
+        logger.warning("Invalid topic received: %s", message.topic.value)
+        return None
+    mqtt_messages_received_total.inc()
+    update_last_seen(serial_number)
+    try:
+        payload = json.loads(message.payload.decode("utf-8"))
+    except json.JSONDecodeError as exc:
+        robot_status_invalid_total.labels("json_decode").inc()
+        logger.warning("Validation failed: %s", exc)
+        return None
+    try:
+        status = RobotStatusIn.model_validate(payload)
+    except ValidationError as exc:
+        robot_status_invalid_total.labels(_classify_validation_error(exc)).inc()
+        logger.warning("Validation failed: %s", exc)
+        return None
+
+    observe_message_lag(status.ts)
+    return serial_number, status, payload
+
+
+async def _insert_rows(
+    rows: list[tuple[str, RobotStatusIn, dict]],
+    skip_duplicates: bool = True,
+) -> tuple[list[tuple[str, RobotStatusIn, dict]], int]:
+    """Insert rows in one transaction; return the rows stored and the rejected count.
+
+    Rows already stored for (serial, ts), e.g. redelivered messages, are
+    neither returned nor counted as rejected. If PostgreSQL rejects the data
+    of some row (e.g. NaN or NUL in the JSONB payload), the rows are retried
+    one per transaction and the rejected ones are logged and left out. Other
+    errors (connection, operational) propagate.
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            inserted = await insert_robot_statuses(session, rows, skip_duplicates)
+            await session.commit()
+        except SQLAlchemyError as exc:
+            await session.rollback()
+            if not is_row_error(exc):
+                raise
+            if len(rows) == 1:
+                serial_number = rows[0][0]
+                logger.warning(
+                    "DB rejected row for serial=%s: %s", serial_number, exc
+                )
+                return [], 1
+        else:
+            remaining = Counter(inserted)
+            stored = []
+            for row in rows:
+                key = (row[0], row[1].ts)
+                if remaining[key]:
+                    remaining[key] -= 1
+                    stored.append(row)
+            return stored, 0
+
+    stored: list[tuple[str, RobotStatusIn, dict]] = []
+    rejected = 0
+    for row in rows:
+        row_stored, row_rejected = await _insert_rows([row], skip_duplicates)
+        stored.extend(row_stored)
+        rejected += row_rejected
+    return stored, rejected
+
+
+async def _flush_batch(
+    client: Client,
+    batch: _IngestBatch,
+    sse_manager: SSEManager,
+    manual_ack: bool,
+    alert_engine: AlertEngine | None = None,
+    skip_duplicates: bool = True,
+) -> None:
+    rows = batch.rows
+    if rows:
+        try:
+            stored, rejected = await _insert_rows(rows, skip_duplicates)
+        except SQLAlchemyError:
+            db_insert_fail_total.inc(len(rows))
+            logger.exception("DB insert failed for batch of %s rows", len(rows))
+            if manual_ack:
+                # Leave the batch unacked; reconnecting makes the broker
+                # redeliver it from the persistent session.
+                raise
+            batch.clear()
+            return
+        # Rows the DB rejected will fail again on redelivery, so they are
+        # counted and acked with the rest of the batch. Rows that were
+        # already stored are not counted, broadcast or evaluated again.
+        db_insert_fail_total.inc(rejected)
+        db_insert_duplicate_total.inc(len(rows) - rejected - len(stored))
+        db_insert_total.inc(len(stored))
+
+        for serial_number, status, payload in stored:
+            robot_status_valid_total.inc()
+            robot_status_updates_total.labels(status.driving_status.value).inc()
+            out = RobotStatusOut(
+                serial_number=serial_number,
+                ts=status.ts,
+                battery_level=status.battery_level,
+                battery_status=status.battery_status,
+                driving_status=status.driving_status,
+                current_drive_id=status.current_drive_id,
+                location=status.location,
+                payload=payload,
+            )
+            sse_manager.broadcast(serial_number, out.model_dump_json(by_alias=True))
+            if alert_engine is not None:
+                alert_engine.process(serial_number, status)
+
+    if manual_ack:
+        # Acks go out in receive order, as MQTT requires for QoS 1.
+        paho_client = _paho_client(client)
+        for mid, qos in batch.acks:
+            paho_client.ack(mid, qos)
+    batch.clear()
+
+
+async def mqtt_subscriber(
+    settings: Settings,
+    sse_manager: SSEManager,
+    alert_engine: AlertEngine | None = None,
+    skip_duplicates: bool = True,
+) -> None:
+    """Ingest robot status messages until cancelled, reconnecting on errors.
+
+    ``skip_duplicates`` inserts with ``ON CONFLICT DO NOTHING`` and needs the
+    unique (serial_number, ts) index; at-least-once delivery relies on it.
+    """
     backoff = 1
+    manual_ack = settings.mqtt_at_least_once
+    qos = 1 if manual_ack else 0
+    # Without at-least-once every message is stored as soon as it arrives.
+    batch_size = max(settings.ingest_batch_size, 1) if manual_ack else 1
+    linger_sec = max(settings.ingest_batch_linger_ms, 0) / 1000 if manual_ack else 0
     while True:
         try:
             logger.info(
@@ -51,85 +261,55 @@ async def mqtt_subscriber(settings: Settings, sse_manager: SSEManager) -> None:
                 settings.mqtt_host,
                 settings.mqtt_port,
             )
-            async with Client(
-                hostname=settings.mqtt_host,
-                port=settings.mqtt_port,
-                username=settings.mqtt_username,
-                password=settings.mqtt_password,
-                protocol=ProtocolVersion.V5,
-            ) as client:
+            async with _client(settings) as client:
                 logger.info(
-                    "MQTT connected (username=%s)",
+                    "MQTT connected (username=%s at_least_once=%s)",
                     settings.mqtt_username or "anonymous",
+                    manual_ack,
                 )
 
-                await client.subscribe("robot/+/status")
-                logger.info("Subscribed to topic robot/+/status")
+                await client.subscribe("robot/+/status", qos=qos)
+                logger.info("Subscribed to topic robot/+/status (qos=%s)", qos)
 
                 backoff = 1
-                async for message in client.messages:
-                    logger.debug(
-                        "Message received: topic=%s payload=%s",
-                        message.topic.value,
-                        message.payload,
-                    )
-                    serial_number = _extract_serial(message.topic.value)
-                    if not serial_number:
-                        logger.warning(
-                            "Invalid topic received: %s", message.topic.value
-                        )
-                        continue
-                    mqtt_messages_received_total.inc()
-                    update_last_seen(serial_number)
-                    try:
-                        payload = json.loads(message.payload.decode("utf-8"))
-                    except json.JSONDecodeError as exc:
-                        robot_status_invalid_total.labels("json_decode").inc()
-                        logger.warning("Validation failed: %s", exc)
-                        continue
-                    try:
-                        status = RobotStatusIn.model_validate(payload)
-                    except ValidationError as exc:
-                        robot_status_invalid_total.labels(
-                            _classify_validation_error(exc)
-                        ).inc()
-                        logger.warning("Validation failed: %s", exc)
-                        continue
-
-                    robot_status_valid_total.inc()
-                    robot_status_updates_total.labels(
-                        status.driving_status.value
-                    ).inc()
-                    observe_message_lag(status.ts)
-
-                    async with AsyncSessionLocal() as session:
-                        try:
-                            await insert_robot_status(
-                                session, serial_number, status, payload
+                batch = _IngestBatch()
+                messages = client.messages
+                next_message = asyncio.ensure_future(anext(messages))
+                try:
+                    while True:
+                        timeout = None
+                        if batch:
+                            timeout = max(
+                                batch.started + linger_sec - time.monotonic(), 0
                             )
-                            await session.commit()
-                            db_insert_total.inc()
-                        except SQLAlchemyError:
-                            await session.rollback()
-                            db_insert_fail_total.inc()
-                            logger.exception(
-                                "DB insert failed for serial=%s", serial_number
-                            )
-                            continue
-
-                    out = RobotStatusOut(
-                        serial_number=serial_number,
-                        ts=status.ts,
-                        battery_level=status.battery_level,
-                        battery_status=status.battery_status,
-                        driving_status=status.driving_status,
-                        current_drive_id=status.current_drive_id,
-                        location=status.location,
-                        payload=payload,
-                    )
-                    sse_manager.broadcast(
-                        serial_number, out.model_dump_json(by_alias=True)
-                    )
+                        # asyncio.wait never cancels the pending read, so a
+                        # message cannot be dropped when the linger expires.
+                        done, _ = await asyncio.wait({next_message}, timeout=timeout)
+                        if next_message in done:
+                            message = next_message.result()
+                            next_message = asyncio.ensure_future(anext(messages))
+                            batch.add(message, _parse_message(message))
+                            if len(batch) < batch_size:
+                                continue
+                        await _flush_batch(
+                            client,
+                            batch,
+                            sse_manager,
+                            manual_ack,
+                            alert_engine,
+                            skip_duplicates,
+                        )
+                finally:
+                    next_message.cancel()
+                    if batch.rows and not manual_ack:
+                        await _flush_batch(
+                            client,
+                            batch,
+                            sse_manager,
+                            manual_ack,
+                            alert_engine,
+                            skip_duplicates,
+                        )
         except MqttError as exc:
             logger.warning("MQTT error: %s. reconnecting in %ss", exc, backoff)
             await asyncio.sleep(backoff)
@@ -137,4 +317,4 @@ async def mqtt_subscriber(settings: Settings, sse_manager: SSEManager) -> None:
         except Exception:
             logger.exception("Unexpected error in mqtt_subscriber. reconnecting in %ss", backoff)
             await asyncio.sleep(backoff)
-            backoff = min(backoff * 2, 30)            
+            backoff = min(backoff * 2, 30)
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Literal
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+AlertOp = Literal[">", ">=", "<", "<=", "==", "!="]
+
+
+class AlertCondition(BaseModel):
+    field: str
+    op: AlertOp = "=="
+    value: Any = None
+
+
+class AlertRuleSpec(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    name: str
+    kind: Literal["threshold", "duration", "rate"]
+    field: str
+    op: AlertOp
+    value: Any = None
+    when: list[AlertCondition] = Field(default_factory=list)
+    for_sec: float = Field(default=0.0, ge=0)
+    severity: str = "warning"
+
+    @model_validator(mode="after")
+    def validate_kind(self) -> "AlertRuleSpec":
+        if self.kind == "duration" and self.for_sec <= 0:
+            raise ValueError("for_sec must be > 0 for duration rules")
+        if self.kind == "rate" and not isinstance(self.value, (int, float)):
+            raise ValueError("value must be numeric for rate rules")
+        return self
+
+
+class AlertEvent(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    rule: str
+    severity: str
+    state: Literal["firing", "resolved"]
+    serial_number: str
+    ts: datetime = Field(alias="timestamp")
+    value: Any = None
@@ -2,11 +2,14 @@ import asyncio
 from collections import defaultdict
 from typing import Any
 
+from prometheus_client import Gauge
+
 from app.metrics import sse_subscribers
 
 
 class SSEManager:
-    def __init__(self) -> None:
+    def __init__(self, gauge: Gauge = sse_subscribers) -> None:
+        self._gauge = gauge
         self._queues: dict[str, set[asyncio.Queue[str]]] = defaultdict(set)
         self._subscriber_count = 0
 
@@ -14,7 +17,7 @@ class SSEManager:
         queue: asyncio.Queue[str] = asyncio.Queue()
         self._queues[serial_number].add(queue)
         self._subscriber_count += 1
-        sse_subscribers.set(self._subscriber_count)
+        self._gauge.set(self._subscriber_count)
         return queue
 
     def unregister(self, serial_number: str, queue: asyncio.Queue[str]) -> None:
@@ -24,7 +27,7 @@ class SSEManager:
         if queue in queues:
             queues.discard(queue)
             self._subscriber_count = max(self._subscriber_count - 1, 0)
-            sse_subscribers.set(self._subscriber_count)
+            self._gauge.set(self._subscriber_count)
         if not queues:
             self._queues.pop(serial_number, None)
 
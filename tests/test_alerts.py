@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+from app.alerts.engine import AlertEngine
+from app.alerts.rules import DEFAULT_RULES, ThresholdRule, compile_rules
+from app.schemas.robot_status import RobotStatusIn
+
+BASE_TS = datetime(2025, 12, 1, tzinfo=timezone.utc)
+
+
+def _status(offset_sec: float, **overrides) -> RobotStatusIn:
+    payload = {
+        "timestamp": (BASE_TS + timedelta(seconds=offset_sec)).isoformat(),
+        "battery_level": 50,
+        "battery_status": "DISCHARGING",
+        "driving_status": "MOVING",
+        "current_drive_id": str(uuid4()),
+        "location": {"latitude": 37.4, "longitude": 127.1, "height": 0.0},
+    }
+    payload.update(overrides)
+    return RobotStatusIn.model_validate(payload)
+
+
+def test_threshold_fires_and_resolves() -> None:
+    engine = AlertEngine(compile_rules(DEFAULT_RULES[:1]))
+    assert engine.process("R1", _status(0, battery_level=30)) == []
+    events = engine.process("R1", _status(1, battery_level=10))
+    assert [(e.rule, e.state) for e in events] == [
+        ("low_battery_while_moving", "firing")
+    ]
+    assert engine.process("R1", _status(2, battery_level=9)) == []
+    idle = _status(
+        3,
+        battery_level=9,
+        driving_status="IDLE",
+        current_drive_id=None,
+        battery_status="CHARGING",
+    )
+    events = engine.process("R1", idle)
+    assert [e.state for e in events] == ["resolved"]
+
+
+def test_duration_fires_after_window() -> None:
+    engine = AlertEngine(compile_rules(DEFAULT_RULES[1:2]))
+    assert engine.process("R1", _status(0)) == []
+    assert engine.process("R1", _status(1799)) == []
+    events = engine.process("R1", _status(1800))
+    assert [e.state for e in events] == ["firing"]
+    assert events[0].value == pytest.approx(1800)
+    idle = _status(
+        2000, driving_status="IDLE", current_drive_id=None, battery_status="CHARGING"
+    )
+    events = engine.process("R1", idle)
+    assert [e.state for e in events] == ["resolved"]
+    assert events[0].value == pytest.approx(2000)
+
+
+def test_rate_rule_uses_ground_speed_per_serial() -> None:
+    engine = AlertEngine(compile_rules(DEFAULT_RULES[2:3]))
+    assert engine.process("R1", _status(0)) == []
+    far = {"latitude": 38.0, "longitude": 127.1, "height": 0.0}
+    assert engine.process("R2", _status(0, location=far)) == []
+    # ~111 m north in 10 s -> ~11 m/s.
+    jump = {"latitude": 37.401, "longitude": 127.1, "height": 0.0}
+    events = engine.process("R1", _status(10, location=jump))
+    assert [e.state for e in events] == ["firing"]
+    assert events[0].value == pytest.approx(11.1, rel=0.01)
+
+
+@pytest.mark.parametrize(
+    "rule",
+    [
+        {"kind": "threshold", "field": "speed", "op": ">", "value": 1},
+        {"kind": "rate", "field": "driving_status", "op": ">", "value": 1},
+        {"kind": "threshold", "field": "current_drive_id", "op": ">", "value": None},
+        {"kind": "threshold", "field": "driving_status", "op": "==", "value": "MOVNG"},
+        {"kind": "threshold", "field": "battery_level", "op": "<", "value": "low"},
+    ],
+)
+def test_compile_rejects_mistyped_rules(rule: dict) -> None:
+    with pytest.raises(ValueError):
+        compile_rules([{"name": "x", **rule}])
+
+
+def test_compile_coerces_values_to_field_type() -> None:
+    rule = {
+        "name": "low",
+        "kind": "threshold",
+        "field": "battery_level",
+        "op": "<",
+        "value": "20",
+    }
+    engine = AlertEngine(compile_rules([rule]))
+    events = engine.process("R1", _status(0, battery_level=10))
+    assert [e.state for e in events] == ["firing"]
+
+
+def test_failing_rule_is_counted_and_skipped() -> None:
+    class _BrokenRule(ThresholdRule):
+        __slots__ = ()
+
+        def evaluate(self, state, status, ts):
+            raise TypeError("boom")
+
+    rules = compile_rules(DEFAULT_RULES[:1])
+    broken = _BrokenRule.__new__(_BrokenRule)
+    broken.name = "broken"
+    broken.severity = "warning"
+    engine = AlertEngine([broken, *rules])
+
+    events = engine.process("R1", _status(0, battery_level=10))
+
+    assert [e.rule for e in events] == ["low_battery_while_moving"]
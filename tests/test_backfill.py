@@ -0,0 +1,121 @@
+import asyncio
+import csv
+import io
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+from asyncpg.exceptions import UntranslatableCharacterError
+
+from app.backfill import cli
+from app.backfill.cli import _copy_rows, _iter_batches, validate_batch
+from app.db.queries import encode_copy_rows
+
+
+def _line(**overrides) -> str:
+    payload = {
+        "timestamp": "2025-12-01T00:00:00Z",
+        "battery_level": 50,
+        "battery_status": "DISCHARGING",
+        "driving_status": "MOVING",
+        "current_drive_id": str(uuid4()),
+        "location": {"latitude": 1.0, "longitude": 2.0, "height": 3.0},
+        "robot_id": "ROBOT-0001",
+    }
+    payload.update(overrides)
+    return json.dumps(payload)
+
+
+def test_validate_batch_classifies_rejects() -> None:
+    capture = json.dumps(
+        {"ts": 0, "topic": "robot/ROBOT-0002/status", "payload": _line(robot_id=None)}
+    )
+    bad_topic = json.dumps({"ts": 0, "topic": 42, "payload": _line()})
+    lines = [
+        _line(),
+        "{broken",
+        _line(current_drive_id=None),
+        _line(battery_level=0),
+        capture,
+        bad_topic,
+        _line(timestamp=None),
+    ]
+
+    rows, record_lines, rejects = validate_batch(11, lines, None)
+
+    assert [row.split(b",", 1)[0] for row in rows] == [b"ROBOT-0001", b"ROBOT-0002"]
+    assert record_lines == [11, 15]
+    assert [(line_no, reason) for line_no, reason, _, _ in rejects] == [
+        (12, "json_decode"),
+        (13, "state_rule"),
+        (14, "schema"),
+        (16, "serial"),
+        (17, "schema"),
+    ]
+
+
+def test_iter_batches_resumes_after_checkpoint() -> None:
+    lines = iter([f"{i}\n" for i in range(1, 8)])
+
+    batches = list(_iter_batches(lines, batch_size=2, skip_lines=3))
+
+    assert batches == [(4, ["4\n", "5\n"]), (6, ["6\n", "7\n"])]
+
+
+def test_encode_copy_rows_round_trips_through_csv() -> None:
+    drive_id = uuid4()
+    payload = json.dumps({"note": 'say "hi",\nbye'})
+    ts = datetime(2025, 12, 1, tzinfo=timezone.utc)
+    records = [
+        ("R1", ts, 50, "DISCHARGING", "MOVING", drive_id, 1.5, 2.0, 3.0, payload),
+        ("R2", ts, 80, "CHARGING", "IDLE", None, 1.0, 2.0, 3.0, None),
+    ]
+
+    rows = encode_copy_rows(records)
+
+    assert len(rows) == 2
+    parsed = list(csv.reader(io.StringIO(b"".join(rows).decode())))
+    assert parsed[0][5] == str(drive_id)
+    assert json.loads(parsed[0][9]) == json.loads(payload)
+    # COPY CSV reads an unquoted empty field as NULL.
+    assert rows[1].endswith(b",,1.0,2.0,3.0,\n")
+
+
+def test_copy_rows_bisects_out_rows_postgres_rejects(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    loaded: list[int] = []
+
+    @asynccontextmanager
+    async def begin():
+        yield None
+
+    async def copy(conn, rows, skip_duplicates) -> None:
+        if any(row.startswith(b"bad") for row in rows):
+            raise UntranslatableCharacterError("unsupported Unicode escape")
+        loaded.extend(int(row.split(b",")[1]) for row in rows)
+
+    monkeypatch.setattr(cli, "engine", type("E", (), {"begin": staticmethod(begin)}))
+    monkeypatch.setattr(cli, "copy_robot_status_rows", copy)
+    rows = [f"{'bad' if i in (3, 6) else 'ok'},{i}\n".encode() for i in range(8)]
+
+    failed = asyncio.run(_copy_rows(rows, list(range(100, 108))))
+
+    assert [line_no for line_no, _ in failed] == [103, 106]
+    assert sorted(loaded) == [0, 1, 2, 4, 5, 7]
+
+
+def test_copy_rows_propagates_connection_errors(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    @asynccontextmanager
+    async def begin():
+        raise ConnectionRefusedError()
+        yield None
+
+    monkeypatch.setattr(cli, "engine", type("E", (), {"begin": staticmethod(begin)}))
+
+    with pytest.raises(ConnectionRefusedError):
+        asyncio.run(_copy_rows([b"ok,0\n"], [1]))
@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pyarrow as pa
+from sqlalchemy.dialects import postgresql
+
+from app.db.queries import export_robot_history_stmt
+from app.export.arrow import EXPORT_SCHEMA, encode_export
+
+TS = datetime(2025, 12, 1, tzinfo=timezone.utc)
+
+
+async def _encode(chunks: list[list[tuple]]) -> bytes:
+    async def partitions():
+        for chunk in chunks:
+            yield chunk
+
+    return b"".join([data async for data in encode_export(partitions(), "arrow")])
+
+
+def test_arrow_stream_round_trips_with_dictionary_enums() -> None:
+    drive_id = str(uuid4())
+    chunks = [
+        [("R1", TS, 50, "CHARGING", "IDLE", None, 1.0, 2.0, 3.0)],
+        [("R2", TS, 40, "DISCHARGING", "MOVING", drive_id, 1.5, 2.5, 0.0)],
+    ]
+
+    table = pa.ipc.open_stream(asyncio.run(_encode(chunks))).read_all()
+
+    assert table.schema == EXPORT_SCHEMA
+    assert table.column("serial_number").to_pylist() == ["R1", "R2"]
+    assert table.column("ts").to_pylist() == [TS, TS]
+    assert table.column("driving_status").to_pylist() == ["IDLE", "MOVING"]
+    assert table.column("current_drive_id").to_pylist() == [None, drive_id]
+
+
+def test_export_order_matches_serial_ts_index_backward_scan() -> None:
+    stmt = export_robot_history_stmt(["R1"], TS, TS)
+
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert sql.endswith(
+        "ORDER BY robot_status_history.serial_number DESC, "
+        "robot_status_history.ts ASC"
+    )
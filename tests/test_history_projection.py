@@ -0,0 +1,128 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.api import routes
+from app.db.queries import HISTORY_FIELDS, HistoryProjection, fleet_snapshot_stmt
+
+TS = datetime(2025, 12, 1, tzinfo=timezone.utc)
+
+
+def test_projection_selects_only_requested_columns() -> None:
+    projection = HistoryProjection(["timestamp", "battery_level", "location"], False)
+
+    assert [column.name for column in projection.columns] == [
+        "ts",
+        "battery_level",
+        "latitude",
+        "longitude",
+        "height",
+    ]
+    encoded = projection.encode([(TS, 50, 1.0, 2.0, 3.0)])
+    assert json.loads(encoded) == [
+        {
+            "timestamp": TS.isoformat(),
+            "battery_level": 50,
+            "location": {"latitude": 1.0, "longitude": 2.0, "height": 3.0},
+        }
+    ]
+
+
+def test_default_projection_keeps_payload_key_without_selecting_it() -> None:
+    projection = HistoryProjection(HISTORY_FIELDS, include_payload=False)
+    drive_id = uuid4()
+
+    assert "payload" not in [column.name for column in projection.columns]
+    row = ("R1", TS, 50, "DISCHARGING", "MOVING", drive_id, 1.0, 2.0, 3.0)
+    (item,) = json.loads(projection.encode([row]))
+    assert item["current_drive_id"] == str(drive_id)
+    assert item["payload"] is None
+
+
+def test_projection_rejects_unknown_fields() -> None:
+    with pytest.raises(ValueError):
+        HistoryProjection(["timestamp", "speed"], False)
+
+
+def test_fleet_snapshot_uses_lateral_latest_row_per_serial() -> None:
+    projection = HistoryProjection(["serial_number", "timestamp"], False)
+
+    sql = str(
+        fleet_snapshot_stmt(TS, projection, [], timedelta(minutes=5)).compile(
+            dialect=postgresql.dialect()
+        )
+    )
+
+    assert "WITH RECURSIVE serials" in sql
+    assert "JOIN LATERAL" in sql
+    assert "ORDER BY robot_status_history.ts DESC" in sql
+    assert "robot_status_history.ts >= " in sql
+
+
+def test_fleet_snapshot_filters_serials_with_one_array_parameter() -> None:
+    projection = HistoryProjection(["serial_number", "timestamp"], False)
+
+    compiled = fleet_snapshot_stmt(TS, projection, ["R2", "R1", "R2"], None).compile(
+        dialect=postgresql.dialect()
+    )
+    sql = str(compiled)
+
+    assert "unnest(" in sql
+    assert "WITH RECURSIVE" not in sql
+    assert ["R2", "R1"] in compiled.params.values()
+
+
+def test_fleet_snapshot_without_max_staleness_has_no_lower_bound() -> None:
+    projection = HistoryProjection(["serial_number", "timestamp"], False)
+
+    sql = str(
+        fleet_snapshot_stmt(TS, projection, [], None).compile(
+            dialect=postgresql.dialect()
+        )
+    )
+
+    assert "robot_status_history.ts <= " in sql
+    assert "robot_status_history.ts >= " not in sql
+
+
+@pytest.mark.parametrize(
+    ("fields", "expected"),
+    [
+        ("timestamp,battery_level", ["serial_number", "ts", "battery_level"]),
+        ("timestamp, serial_number", ["ts", "serial_number"]),
+    ],
+)
+def test_snapshot_route_always_selects_serial_number(
+    monkeypatch: pytest.MonkeyPatch, fields: str, expected: list[str]
+) -> None:
+    projections: list[HistoryProjection] = []
+
+    class _Session:
+        async def __aenter__(self) -> "_Session":
+            return self
+
+        async def __aexit__(self, *exc) -> None:
+            return None
+
+    async def fetch(session, at, projection, serial_numbers, max_staleness):
+        projections.append(projection)
+        return []
+
+    monkeypatch.setattr(routes, "AsyncSessionLocal", _Session)
+    monkeypatch.setattr(routes, "fetch_fleet_snapshot", fetch)
+
+    asyncio.run(
+        routes.fleet_snapshot(
+            at="2025-12-01T00:00:00Z",
+            serial_number=[],
+            max_staleness_sec=None,
+            include_payload=False,
+            fields=fields,
+        )
+    )
+
+    assert [column.name for column in projections[0].columns] == expected
@@ -0,0 +1,193 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from asyncpg.exceptions import UntranslatableCharacterError
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DataError, OperationalError
+
+from app.db.queries import insert_robot_statuses
+from app.mqtt import subscriber
+from app.schemas.robot_status import RobotStatusIn
+from app.sse.manager import SSEManager
+
+
+class _FakeSession:
+    def __init__(self, fail: bool) -> None:
+        self.fail = fail
+        self.committed = False
+
+    async def __aenter__(self) -> "_FakeSession":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+    async def commit(self) -> None:
+        if self.fail:
+            raise OperationalError("INSERT", {}, Exception("db down"))
+        self.committed = True
+
+    async def rollback(self) -> None:
+        return None
+
+
+class _FakeClient:
+    def __init__(self) -> None:
+        self.acked: list[tuple[int, int]] = []
+        self._client = SimpleNamespace(
+            ack=lambda mid, qos: self.acked.append((mid, qos))
+        )
+
+
+class _FakeAlertEngine:
+    def __init__(self) -> None:
+        self.evaluated: list[str] = []
+
+    def process(self, serial_number: str, status: RobotStatusIn) -> list:
+        self.evaluated.append(serial_number)
+        return []
+
+
+def _batch() -> subscriber._IngestBatch:
+    status = RobotStatusIn.model_validate(
+        {
+            "timestamp": "2025-12-01T00:00:00Z",
+            "battery_level": 50,
+            "battery_status": "CHARGING",
+            "driving_status": "IDLE",
+            "location": {"latitude": 1.0, "longitude": 2.0, "height": 3.0},
+        }
+    )
+    batch = subscriber._IngestBatch()
+    batch.add(SimpleNamespace(mid=1, qos=1), ("R1", status, {}))
+    batch.add(SimpleNamespace(mid=2, qos=1), None)
+    batch.add(SimpleNamespace(mid=3, qos=1), ("R2", status, {}))
+    return batch
+
+
+def _patch_db(monkeypatch: pytest.MonkeyPatch, fail: bool) -> list:
+    inserted: list = []
+
+    async def insert(session, rows, skip_duplicates) -> list:
+        if any(row[0] == "BAD" for row in rows):
+            orig = UntranslatableCharacterError("unsupported Unicode escape")
+            raise DataError("INSERT", {}, orig)
+        stored = {(row[0], row[1].ts) for row in inserted}
+        new = [row for row in rows if (row[0], row[1].ts) not in stored]
+        inserted.extend(new)
+        return [(row[0], row[1].ts) for row in new]
+
+    monkeypatch.setattr(subscriber, "AsyncSessionLocal", lambda: _FakeSession(fail))
+    monkeypatch.setattr(subscriber, "insert_robot_statuses", insert)
+    return inserted
+
+
+def test_flush_acks_in_receive_order_after_commit(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    inserted = _patch_db(monkeypatch, fail=False)
+    client = _FakeClient()
+    batch = _batch()
+
+    asyncio.run(subscriber._flush_batch(client, batch, SSEManager(), True))
+
+    assert [row[0] for row in inserted] == ["R1", "R2"]
+    assert client.acked == [(1, 1), (2, 1), (3, 1)]
+    assert len(batch) == 0
+
+
+def test_flush_leaves_batch_unacked_when_commit_fails(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    _patch_db(monkeypatch, fail=True)
+    client = _FakeClient()
+    batch = _batch()
+
+    engine = _FakeAlertEngine()
+
+    with pytest.raises(OperationalError):
+        asyncio.run(
+            subscriber._flush_batch(client, batch, SSEManager(), True, engine)
+        )
+
+    assert client.acked == []
+    assert engine.evaluated == []
+    assert len(batch) == 3
+
+
+def test_flush_skips_and_acks_rows_the_db_rejects(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    inserted = _patch_db(monkeypatch, fail=False)
+    client = _FakeClient()
+    batch = _batch()
+    status = batch.rows[0][1]
+    batch.add(SimpleNamespace(mid=4, qos=1), ("BAD", status, {}))
+    engine = _FakeAlertEngine()
+
+    asyncio.run(subscriber._flush_batch(client, batch, SSEManager(), True, engine))
+
+    assert [row[0] for row in inserted] == ["R1", "R2"]
+    assert engine.evaluated == ["R1", "R2"]
+    assert client.acked == [(1, 1), (2, 1), (3, 1), (4, 1)]
+
+
+def test_flush_does_not_rebroadcast_redelivered_rows(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    inserted = _patch_db(monkeypatch, fail=False)
+    client = _FakeClient()
+    sse_manager = SSEManager()
+    queue = sse_manager.register("R1")
+    engine = _FakeAlertEngine()
+
+    for _ in range(2):
+        # The broker redelivers the batch after a lost PUBACK.
+        asyncio.run(
+            subscriber._flush_batch(client, _batch(), sse_manager, True, engine)
+        )
+
+    assert [row[0] for row in inserted] == ["R1", "R2"]
+    assert queue.qsize() == 1
+    assert engine.evaluated == ["R1", "R2"]
+    assert client.acked == [(1, 1), (2, 1), (3, 1)] * 2
+
+
+@pytest.mark.parametrize("skip_duplicates", [True, False])
+def test_insert_returns_stored_keys_with_optional_conflict_skip(
+    skip_duplicates: bool,
+) -> None:
+    executed: list = []
+
+    class _Session:
+        async def execute(self, stmt, params):
+            executed.append(stmt)
+            return [SimpleNamespace(serial_number="R1", ts=params[0]["ts"])]
+
+    status = _batch().rows[0][1]
+
+    keys = asyncio.run(
+        insert_robot_statuses(_Session(), [("R1", status, {})], skip_duplicates)
+    )
+
+    sql = str(executed[0].compile(dialect=postgresql.dialect()))
+    assert keys == [("R1", status.ts)]
+    assert "RETURNING" in sql
+    assert ("ON CONFLICT" in sql) is skip_duplicates
+
+
+def test_insert_rows_keeps_repeated_keys_stored_without_conflict_skip(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def insert(session, rows, skip_duplicates) -> list:
+        return [(row[0], row[1].ts) for row in rows]
+
+    monkeypatch.setattr(subscriber, "AsyncSessionLocal", lambda: _FakeSession(False))
+    monkeypatch.setattr(subscriber, "insert_robot_statuses", insert)
+    row = _batch().rows[0]
+
+    stored, rejected = asyncio.run(subscriber._insert_rows([row, row], False))
+
+    assert stored == [row, row]
+    assert rejected == 0
@@ -0,0 +1,118 @@
+import asyncio
+import gzip
+import json
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from aiomqtt import MqttError
+
+from app.mock import replay as replay_module
+from app.mock.replay import _iter_jsonl, replay
+
+SETTINGS = {"mqtt_qos": 1}
+
+
+class _FakeClient:
+    def __init__(self, published: list, fail: bool = False) -> None:
+        self.published = published
+        self.fail = fail
+        self.index = len(published)
+        published.append([])
+
+    async def __aenter__(self) -> "_FakeClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+    async def publish(self, topic: str, payload: str, qos: int) -> None:
+        if self.fail:
+            raise MqttError("broker gone")
+        self.published[self.index].append((topic, payload, time.monotonic()))
+
+
+class _FakeClock:
+    """Stands in for ``time.monotonic``/``asyncio.sleep`` inside replay."""
+
+    def __init__(self) -> None:
+        self.now = 100.0
+        self.sleeps: list[float] = []
+        self._sleep = asyncio.sleep
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.sleeps.append(delay)
+        self.now += delay
+        await self._sleep(0)
+
+
+async def _records(items: list[tuple[float, str, str]]):
+    for item in items:
+        yield item
+
+
+async def _collect(path: Path) -> list:
+    return [record async for record in _iter_jsonl(path)]
+
+
+def test_iter_jsonl_reads_gzip_capture_and_skips_bad_lines(tmp_path: Path) -> None:
+    path = tmp_path / "capture.jsonl.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        fh.write(json.dumps({"ts": 1.5, "topic": "robot/R1/status", "payload": "{}"}))
+        fh.write("\nnot json\n")
+        fh.write(json.dumps({"ts": 2.0, "topic": "robot/R2/status", "payload": "{}"}))
+        fh.write("\n")
+
+    records = asyncio.run(_collect(path))
+
+    assert records == [
+        (1.5, "robot/R1/status", "{}"),
+        (2.0, "robot/R2/status", "{}"),
+    ]
+
+
+def test_replay_scales_timing_and_shards_by_serial(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    published: list[list] = []
+    monkeypatch.setattr(replay_module, "_client", lambda s: _FakeClient(published))
+    clock = _FakeClock()
+    monkeypatch.setattr(
+        replay_module, "time", SimpleNamespace(monotonic=clock.monotonic)
+    )
+    monkeypatch.setattr(replay_module.asyncio, "sleep", clock.sleep)
+    records = [(float(i), f"robot/R{i % 4}/status", str(i)) for i in range(8)]
+
+    total = asyncio.run(replay(SETTINGS, _records(records), 20.0, 3, False))
+
+    assert total == 8
+    # 1 s between recorded messages at 20x speed; the first goes out at once.
+    assert clock.sleeps == pytest.approx([0.05] * 7)
+    assert clock.now == pytest.approx(100.35)
+    topics_per_client = [{topic for topic, _, _ in sent} for sent in published]
+    for topic in {topic for _, topic, _ in records}:
+        assert sum(topic in topics for topics in topics_per_client) == 1
+    for sent in published:
+        payloads = [int(payload) for _, payload, _ in sent]
+        assert payloads == sorted(payloads)
+
+
+def test_replay_raises_when_publish_worker_dies(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    published: list[list] = []
+    monkeypatch.setattr(
+        replay_module, "_client", lambda s: _FakeClient(published, fail=True)
+    )
+    monkeypatch.setattr(replay_module, "QUEUE_SIZE", 1)
+    records = [(0.0, "robot/R1/status", str(i)) for i in range(10)]
+
+    async def run() -> None:
+        await asyncio.wait_for(replay(SETTINGS, _records(records), 0, 1, False), 5)
+
+    with pytest.raises(MqttError):
+        asyncio.run(run())